@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ResponseCache:
+    """
+    行程內的讀取快取，用來存放 GET API 的查詢結果。
+    key 使用請求路徑 (例如 /books?after_id=0&limit=50&skip=0 或 /books/1)，
+    資料異動時由寫入的 API 主動清除對應的 key。
+    """
+
+    def __init__(self, ttl_seconds: int = 60, max_entries: int = 1024):
+        self._ttl = ttl_seconds # 快取有效秒數
+        self._max_entries = max_entries # 快取筆數上限，超過時淘汰最久未使用的資料
+        self._entries = OrderedDict() # key -> (到期時間, 資料)
+        self._version = 0 # 每次清除快取就遞增，避免把清除前查到的舊資料寫回快取
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: str, loader):
+        """
+        有快取就直接回傳，否則呼叫 loader() 查詢並存入快取。
+        loader() 回傳 None (例如查無資料) 時不會被快取。
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now: # 命中且尚未過期
+                self._entries.move_to_end(key)
+                return entry[1]
+            version = self._version
+
+        value = loader() # 查詢時不持有鎖，避免阻塞其他請求
+
+        if value is not None:
+            with self._lock:
+                if version == self._version: # 查詢期間沒有資料異動才寫入
+                    self._entries[key] = (now + self._ttl, value)
+                    self._entries.move_to_end(key)
+                    if len(self._entries) > self._max_entries:
+                        self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key: str):
+        """
+        清除單一 key 的快取。
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+            self._version += 1
+
+    def invalidate_prefix(self, prefix: str):
+        """
+        清除所有以 prefix 開頭的快取，例如 "/books?" 會清掉所有列表分頁。
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+            self._version += 1
+
+
+cache_manager = ResponseCache(ttl_seconds=60) # 模組層級的快取，所有請求共用
@@ -1,187 +1,264 @@
 import sqlite3
 import datetime
-import os
+import queue
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
 
-def get_db_connection() -> sqlite3.Connection:
+_DB_FILE = 'bokelai.db' # 資料庫檔案
+
+# 常用的 SQL 指令定義成模組常數，每次都傳入同一個字串物件，
+# 讓 sqlite3 的 statement cache 直接命中，不必重新解析 SQL
+# 明確列出欄位取代 SELECT *，欄位順序固定，查詢結果可以直接對應到 Book
+_BOOK_COLUMNS = 'id, title, author, publisher, price, publish_date, isbn, cover_url, created_at'
+_SQL_SELECT_ALL = f'SELECT {_BOOK_COLUMNS} FROM books WHERE id > ? ORDER BY id LIMIT ? OFFSET ?'
+_SQL_SELECT_BY_ID = f'SELECT {_BOOK_COLUMNS} FROM books WHERE id = ?'
+_SQL_INSERT = """
+    INSERT INTO books (title, author, publisher, price, publish_date, isbn, cover_url)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+# RETURNING (SQLite 3.35+) 讓寫入時直接帶回整筆資料，不必再查詢一次
+_SQL_INSERT_RETURNING = _SQL_INSERT + f'RETURNING {_BOOK_COLUMNS}'
+_SQL_UPDATE = f"""
+    UPDATE books
+    SET title = ?, author = ?, publisher = ?, price = ?,
+        publish_date = ?, isbn = ?, cover_url = ?
+    WHERE id = ?
+    RETURNING {_BOOK_COLUMNS}
+"""
+_SQL_DELETE = 'DELETE FROM books WHERE id = ? RETURNING id'
+_SQL_LAST_ROWID = 'SELECT last_insert_rowid()'
+
+MAX_BATCH_IDS = 100 # 批次查詢一次最多帶入的 ID 數量
+MAX_SKIP = 1000 # 舊版 OFFSET 分頁允許的最大 skip，更深的分頁請改用 after_id
+
+# 資料表與索引的 DDL，isbn / author / created_at 的索引讓查詢與排序不必全表掃描
+# 修改 schema 時請遞增 _SCHEMA_VERSION，並在 _SCHEMA_SQL 加入對應的 DDL
+_SCHEMA_VERSION = 1
+_SCHEMA_SQL = f"""
+    BEGIN;
+    CREATE TABLE IF NOT EXISTS books (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT NOT NULL,
+        author TEXT NOT NULL,
+        publisher TEXT,
+        price INTEGER NOT NULL,
+        publish_date TEXT,
+        isbn TEXT,
+        cover_url TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_books_isbn ON books(isbn);
+    CREATE INDEX IF NOT EXISTS idx_books_author ON books(author);
+    CREATE INDEX IF NOT EXISTS idx_books_created_at ON books(created_at);
+    PRAGMA user_version = {_SCHEMA_VERSION};
+    COMMIT;
+"""
+
+# 書籍資料列，欄位順序與 _BOOK_COLUMNS 相同，可用 book.title 或 book[1] 讀取欄位。
+# 類別只在載入模組時建立一次；連線使用預設的 tuple row_factory，
+# 查詢後再用 Book._make 包裝，不必為每一列建立 dict
+Book = namedtuple('Book', _BOOK_COLUMNS.split(', '))
+
+
+def _to_book(row: tuple | None) -> Book | None:
     """
-    建立並回傳 SQLite 資料庫連線。
-    如果 bokelai.db 不存在，會自動建立並初始化 books 資料表。
+    把單一查詢結果轉成 Book，查無資料 (None) 時回傳 None。
     """
-    try:
-        db_file = 'bokelai.db'
-        db_exists = os.path.exists(db_file)
-
-        conn = sqlite3.connect(db_file) # 建立連線
-        conn.row_factory = sqlite3.Row  # 設定 row_factory 回傳字典形式的列
-
-        if not db_exists:# 沒有資料庫檔案，則建立資料表
-            # 初始化資料表
-            create_table_sql = """
-            CREATE TABLE books (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                author TEXT NOT NULL,
-                publisher TEXT,
-                price INTEGER NOT NULL,         
-                publish_date TEXT,                
-                isbn TEXT,
-                cover_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """       # 建立資料表的 SQL 指令
-             
-            conn.execute(create_table_sql) # 執行建立資料表的 SQL
-            conn.commit() # 提交變更
-        
-
-        return conn
-
-    except Exception as e:
-        print(f"資料庫連線錯誤：{e}")
-        return None
-
-
-        
-    
-
-def get_all_books(skip: int, limit: int) -> list[dict]:
-    """
-    取得所有書籍，支援分頁功能。
-    參數: skip - 跳過的書籍數量
-          limit - 回傳的書籍數量上限    
-    """
-    conn = get_db_connection() # 取得連線
-    if conn is None: # 防呆
-        return []
-        
-    try:
-        cursor = conn.cursor() # 建立 cursor
-        cursor.execute('SELECT * FROM books LIMIT ? OFFSET ?', (limit, skip)) # 執行查詢
-        rows = cursor.fetchall()# 取得所有結果
-        
-        # 因為在 get_db_connection 設定了 row_factory = sqlite3.Row
-        # 所以直接轉 dict，不用 zip 欄位名稱
-        books = [dict(row) for row in rows] 
-        return books
-        
-    except Exception as e:
-        print(f"查詢錯誤：{e}")
-        return []
-        
-    finally:
-        conn.close() # 2. 確保一定會關閉連線
-   
-    
-def get_book_by_id(book_id: int) -> dict | None:
+    return Book._make(row) if row is not None else None
+
+
+def init_schema():
     """
-    根據書籍 ID 取得單一書籍資料。
+    建立 books 資料表與索引，並把版本記錄在 PRAGMA user_version。
+    資料庫版本已是最新時不做任何事。只需在程式啟動時執行一次，不必在每次取得連線時檢查。
     """
-    conn = get_db_connection()  # 取得連線
-    if conn is None: # 防呆
-        return None
-    
+    conn = sqlite3.connect(_DB_FILE)
     try:
-        cursor = conn.cursor() # 建立 cursor
-        cursor.execute('SELECT * FROM books WHERE id = ?', (book_id,)) # 執行查詢
-        row = cursor.fetchone() # 取得單一結果
-        
-        if row: 
-            # 因為 row_factory = sqlite3.Row，直接用 dict() 轉換
-            return dict(row)
-        else:
-            return None
-
-    except Exception as e:
-        print(f"查詢書籍時發生錯誤：{e}")
-        return None
-        
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version < _SCHEMA_VERSION:
+            # 用 executescript 在同一個交易中一次送出所有 DDL，只需解析一次
+            conn.executescript(_SCHEMA_SQL)
     finally:
-        # 關閉連線
         conn.close()
 
 
-def create_book(title: str, author: str, publisher: str | None, price: int, 
-                publish_date: str | None, isbn: str | None, cover_url: str | None) -> int:
+def get_db_connection() -> sqlite3.Connection:
     """
-    新增一本書籍到資料庫，並回傳新書籍的 ID。
+    建立並回傳 SQLite 資料庫連線，連線失敗時直接拋出 sqlite3.Error。
+    資料表需先由 init_schema() 建立。
     """
-    conn = get_db_connection() # 取得連線
-    if conn is None: # 防呆
-        return -1
+    # check_same_thread=False：連線由連線池管理，會被 FastAPI 的不同執行緒重複使用
+    # cached_statements：連線長期保留，編譯過的 SQL 可以跨請求重複使用
+    conn = sqlite3.connect(_DB_FILE, check_same_thread=False, cached_statements=256) # 建立連線
 
-    try:
-        cursor = conn.cursor() # 建立 cursor
-        cursor.execute("""  
-            INSERT INTO books (title, author, publisher, price, publish_date, isbn, cover_url)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (title, author, publisher, price, publish_date, isbn, cover_url)) # 執行插入
-        
-        conn.commit() # 提交變更
-        return cursor.lastrowid  # 回傳新插入的 ID
-        
-    except Exception as e:
-        print(f"新增書籍時發生錯誤：{e}")
-        return -1
-        
-    finally:
-        conn.close() # 關閉連線
+    # 連線層級的 PRAGMA 設定，只在連線池建立連線時執行一次，之後整條連線都有效
+    conn.execute('PRAGMA journal_mode=WAL')  # WAL：讀取不會被寫入擋住
+    # synchronous=NORMAL：WAL 模式下只在 checkpoint 時 fsync，commit 不再每次 fsync。
+    # 代價是作業系統當機或斷電時，可能遺失最後幾筆已 commit 的交易 (資料庫不會損毀)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA mmap_size=268435456')  # 256MB 記憶體映射，減少 read() 系統呼叫
+    conn.execute('PRAGMA cache_size=-20000')  # page cache 約 20MB
+    conn.execute('PRAGMA temp_store=MEMORY')  # 暫存表與排序放在記憶體
+    conn.execute('PRAGMA foreign_keys=ON')
+
+    return conn
 
 
-def update_book(book_id: int, title: str, author: str, publisher: str | None, 
-                price: int, publish_date: str | None, isbn: str | None, cover_url: str | None) -> bool:
+class ConnectionPool:
     """
-    更新指定 ID 的書籍資料。
+    SQLite 連線池。
+    連線建立後會長期保留並重複使用，避免每個請求都重新連線、丟掉 SQLite 的 page cache。
+    最多建立 size 條連線，全部被借走時 acquire() 會等待其他請求歸還。
     """
-    conn = get_db_connection() # 取得連線
-    if conn is None: # 防呆 
-        return False
 
-    try:
-        cursor = conn.cursor() # 建立 cursor
-        cursor.execute("""
-            UPDATE books 
-            SET title = ?, author = ?, publisher = ?, price = ?, 
-                publish_date = ?, isbn = ?, cover_url = ? 
-            WHERE id = ?
-        """, (title, author, publisher, price, publish_date, isbn, cover_url, book_id)) # 執行更新
-        
-        conn.commit() # 提交變更
-        
-        if cursor.rowcount > 0: # 有更新到資料
-            return True
-        else: # 沒有更新到資料 (ID不存在）
-            return False
-            
-    except Exception as e:
-        print(f"更新書籍時發生錯誤：{e}")
-        return False
-        
-    finally:
-        conn.close()# 關閉連線
+    def __init__(self, factory, size: int = 8):
+        self._factory = factory # 建立新連線的函式
+        self._size = size # 連線數量上限
+        self._idle = queue.Queue(maxsize=size) # 閒置中的連線
+        self._created = 0 # 目前已建立的連線數
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection | None:
+        """
+        尚未達到上限時建立一條新連線，否則回傳 None。
+        """
+        with self._lock:
+            if self._created >= self._size:
+                return None
+            conn = self._factory() # 連線失敗會直接拋出例外
+            self._created += 1
+            return conn
+
+    @contextmanager
+    def acquire(self):
+        """
+        借出一條連線，with 區塊結束後自動歸還到連線池。
+        """
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open() or self._idle.get() # 已達上限就等待歸還
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction: # 發生例外時交易可能未結束，先復原再歸還
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self):
+        """
+        關閉所有閒置中的連線。
+        """
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+
+pool = ConnectionPool(get_db_connection, size=8) # 模組層級的連線池，所有請求共用
+
+
+
+def get_all_books(after_id: int = 0, limit: int = 50, skip: int = 0) -> list[Book]:
+    """
+    取得所有書籍，使用 keyset (cursor) 分頁。
+    參數: after_id - 上一頁最後一本書的 ID，只回傳 ID 大於此值的書籍
+          limit - 回傳的書籍數量上限
+          skip - 舊版 OFFSET 分頁的相容參數，最多 MAX_SKIP (1000)，超過時拋出 ValueError
+    """
+    if skip > MAX_SKIP: # OFFSET 需要掃描再丟棄資料，只允許很小的值
+        raise ValueError(f"skip must be at most {MAX_SKIP}; use after_id for deeper pages")
+
+    with pool.acquire() as conn: # 從連線池取得連線，結束後自動歸還
+        # 透過主鍵索引直接定位到 after_id，不需要掃描再丟棄前面的資料
+        rows = conn.execute(_SQL_SELECT_ALL, (after_id, limit, skip)).fetchall()
+    return list(map(Book._make, rows))
+
+
+def get_book_by_id(book_id: int) -> Book | None:
+    """
+    根據書籍 ID 取得單一書籍資料，查無資料時回傳 None。
+    """
+    with pool.acquire() as conn: # 從連線池取得連線
+        return _to_book(conn.execute(_SQL_SELECT_BY_ID, (book_id,)).fetchone()) # 取得單一結果
+
+
+@lru_cache(maxsize=MAX_BATCH_IDS)
+def _sql_select_by_ids(count: int) -> str:
+    """
+    產生 WHERE id IN (?, ?, ...) 的查詢，相同數量的 ID 重用同一個字串，讓 statement cache 命中。
+    """
+    placeholders = ', '.join('?' * count)
+    return f'SELECT {_BOOK_COLUMNS} FROM books WHERE id IN ({placeholders}) ORDER BY id'
+
+
+def get_books_by_ids(ids: list[int]) -> list[Book]:
+    """
+    用一次 IN 查詢取得多本書籍，依 ID 排序，不存在的 ID 會被略過。
+    參數: ids - 書籍 ID 列表，最多 MAX_BATCH_IDS 個
+    """
+    if not ids:
+        return []
+
+    with pool.acquire() as conn: # 從連線池取得連線
+        rows = conn.execute(_sql_select_by_ids(len(ids)), tuple(ids)).fetchall()
+    return list(map(Book._make, rows))
+
+
+def create_book(title: str, author: str, publisher: str | None, price: int,
+                publish_date: str | None, isbn: str | None, cover_url: str | None) -> Book:
+    """
+    新增一本書籍到資料庫，並回傳新書籍的完整資料。
+    """
+    with pool.acquire() as conn: # 從連線池取得連線
+        with conn: # 交易：成功時自動 commit，發生例外時自動 rollback
+            cursor = conn.execute(_SQL_INSERT_RETURNING, (title, author, publisher, price, publish_date, isbn, cover_url)) # 執行插入
+            return Book._make(cursor.fetchone()) # RETURNING 帶回新增的資料
+
+
+def create_books_bulk(books: list[tuple]) -> list[int]:
+    """
+    在同一個交易中一次新增多本書籍，並回傳新書籍的 ID 列表。
+    參數: books - 每本書為 (title, author, publisher, price, publish_date, isbn, cover_url)
+    整批只 commit 一次，任何一筆失敗則整批 rollback。
+    """
+    if not books:
+        return []
+
+    with pool.acquire() as conn: # 從連線池取得連線
+        with conn: # 整批共用一個交易，只 commit 一次
+            conn.executemany(_SQL_INSERT, books) # 批次插入
+            # executemany 不會更新 lastrowid，改用 last_insert_rowid() 取得最後一筆 ID
+            last_id = conn.execute(_SQL_LAST_ROWID).fetchone()[0]
+    # 同一個交易持有寫入鎖，新 ID 一定是連續的
+    first_id = last_id - len(books) + 1
+    return list(range(first_id, last_id + 1))
+
+
+def update_book(book_id: int, title: str, author: str, publisher: str | None,
+                price: int, publish_date: str | None, isbn: str | None, cover_url: str | None) -> Book | None:
+    """
+    更新指定 ID 的書籍資料，並回傳更新後的完整資料。
+    若 ID 不存在則回傳 None。
+    """
+    with pool.acquire() as conn: # 從連線池取得連線
+        with conn: # 交易：成功時自動 commit，發生例外時自動 rollback
+            cursor = conn.execute(_SQL_UPDATE, (title, author, publisher, price, publish_date, isbn, cover_url, book_id)) # 執行更新
+            return _to_book(cursor.fetchone()) # RETURNING 帶回更新後的資料，需在 commit 前取出
 
 
 def delete_book(book_id: int) -> bool:
     """
     刪除指定 ID 的書籍。
     """
-    conn = get_db_connection()  # 取得連線
-    if conn is None: # 防呆
-        return False
-
-    try:
-        cursor = conn.cursor() # 建立 cursor
-        cursor.execute('DELETE FROM books WHERE id = ?', (book_id,)) # 執行刪除
-        
-        conn.commit() # 提交變更
-        
-        if cursor.rowcount > 0: # 有刪除資料
-            return True
-        else:
-            return False
-            
-    except Exception as e:
-        print(f"刪除書籍時發生錯誤：{e}")
-        return False
-        
-    finally:
-        conn.close() # 關閉連線
\ No newline at end of file
+    with pool.acquire() as conn: # 從連線池取得連線
+        with conn: # 交易：成功時自動 commit，發生例外時自動 rollback
+            # RETURNING id 有回傳資料代表有刪除到書籍
+            return conn.execute(_SQL_DELETE, (book_id,)).fetchone() is not None # 執行刪除
@@ -1,9 +1,44 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from contextlib import asynccontextmanager
+import logging
+import sqlite3
 from typing import List
 import database
 import models
+from cache import cache_manager
 
-app = FastAPI()
+# 設定全域 logging，錯誤訊息統一由 logging 輸出 (取代 print)
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    應用程式生命週期：啟動時初始化資料表，關閉服務時一併關閉連線池內的所有連線。
+    """
+    database.init_schema() # 只在啟動時建立資料表與索引一次
+    yield
+    database.pool.close() # 關閉連線池
+
+# 預設改用 orjson 序列化回應，書籍列表等大型 JSON 編碼更快
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+@app.exception_handler(sqlite3.IntegrityError)
+async def integrity_error_handler(request: Request, exc: sqlite3.IntegrityError):
+    """
+    違反資料表限制 (例如必填欄位為空) 時回傳 400。
+    """
+    log.warning("資料驗證失敗：%s", exc)
+    return ORJSONResponse(status_code=400, content={"detail": "Invalid book data. Check required fields."})
+
+@app.exception_handler(sqlite3.Error)
+async def database_error_handler(request: Request, exc: sqlite3.Error):
+    """
+    其他資料庫錯誤統一回傳 500。
+    """
+    log.error("資料庫錯誤", exc_info=exc)
+    return ORJSONResponse(status_code=500, content={"detail": "Database error"})
 
 @app.get("/")
 def root():
@@ -13,11 +48,33 @@ def root():
     return {"message": "AI Books API"} # 回傳簡單訊息確認服務運作
 
 @app.get("/books", response_model=List[models.BookResponse]) # 指定回傳型別為書籍列表
-def get_books(skip: int = 0, limit: int = 0):
+def get_books(response: Response,
+              after_id: int = Query(0, ge=0),
+              limit: int = Query(50, ge=1, le=200),  # 限制每頁筆數，避免一次查詢過多資料
+              skip: int = Query(0, ge=0, le=database.MAX_SKIP),  # OFFSET 只允許很小的值
+              ids: str | None = None):
     """
-    取得書籍列表，支援分頁 (skip, limit)。
+    取得書籍列表，支援 cursor 分頁 (after_id, limit)。
+    若還有下一頁，會在 X-Next-Cursor 標頭回傳下一次請求要帶的 after_id。
+    skip 僅為舊版 OFFSET 分頁保留，最多 1000 (database.MAX_SKIP)，更深的分頁請用 after_id。
+    帶入 ids (例如 ids=1,2,3) 時改為一次取得指定的多本書籍，此時忽略分頁參數。
     """
-    books = database.get_all_books(skip, limit) # 從資料庫取得書籍列表
+    if ids is not None:
+        try:
+            book_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip())) # 去除重複 ID
+        except ValueError:
+            raise HTTPException(status_code=422, detail="ids must be a comma-separated list of integers")
+        if len(book_ids) > database.MAX_BATCH_IDS:
+            raise HTTPException(status_code=422, detail=f"ids accepts at most {database.MAX_BATCH_IDS} values")
+
+        key = "/books?ids=" + ",".join(map(str, book_ids))
+        return cache_manager.get_or_load(key, lambda: database.get_books_by_ids(book_ids))
+
+    # 從快取或資料庫取得書籍列表
+    key = f"/books?after_id={after_id}&limit={limit}&skip={skip}"
+    books = cache_manager.get_or_load(key, lambda: database.get_all_books(after_id, limit, skip))
+    if books and len(books) == limit: # 本頁已滿，可能還有下一頁
+        response.headers["X-Next-Cursor"] = str(books[-1].id)
     return books # 回傳書籍列表
 
 @app.get("/books/{book_id}", response_model=models.BookResponse) # 指定回傳型別為單一書籍
@@ -26,7 +83,7 @@ def get_book(book_id: int):
     根據 ID 取得特定書籍詳情。
     若找不到書籍，回傳 404。
     """
-    book = database.get_book_by_id(book_id) # 從資料庫取得書籍
+    book = cache_manager.get_or_load(f"/books/{book_id}", lambda: database.get_book_by_id(book_id)) # 從快取或資料庫取得書籍
     if not book: # 找不到書籍
         raise HTTPException(status_code=404, detail="Book not found") # 回傳 404 錯誤
     return book # 回傳書籍詳情 
@@ -35,20 +92,31 @@ def get_book(book_id: int):
 def create_book(book: models.BookCreate):
     """
     新增一本書籍。
-    成功回傳 201 Created。
+    成功回傳 201 Created；必填欄位缺漏時回傳 400。
     """
     # 呼叫資料庫函式新增書籍
-    new_id = database.create_book(
+    new_book = database.create_book(
         book.title, book.author, book.publisher,
         book.price, book.publish_date, book.isbn, book.cover_url
     )
-    # 檢查是否成功新增
-    if new_id == -1:# 假設 -1 代表新增失敗
-        raise HTTPException(status_code=400, detail="Create book failed. Check required fields.")
-
-    new_book = database.get_book_by_id(new_id)
+    cache_manager.invalidate_prefix("/books?") # 書籍列表已變動，清除列表快取
     return new_book
 
+@app.post("/books/bulk", response_model=List[int], status_code=201) # 回傳新書籍的 ID 列表
+def create_books_bulk(books: List[models.BookCreate]):
+    """
+    一次新增多本書籍，整批在同一個交易中寫入。
+    成功回傳 201 Created 與新書籍的 ID 列表；任何一筆失敗則整批不寫入並回傳 400。
+    """
+    rows = [
+        (book.title, book.author, book.publisher,
+         book.price, book.publish_date, book.isbn, book.cover_url)
+        for book in books
+    ]
+    new_ids = database.create_books_bulk(rows) # 呼叫資料庫函式批次新增書籍
+    cache_manager.invalidate_prefix("/books?") # 書籍列表已變動，清除列表快取
+    return new_ids
+
 @app.put("/books/{book_id}", response_model=models.BookResponse)# 指定回傳型別為單一書籍
 def update_book(book_id: int, book: models.BookCreate):
     """
@@ -56,16 +124,17 @@ def update_book(book_id: int, book: models.BookCreate):
     若 ID 不存在，回傳 404。
     """
     # 呼叫資料庫函式更新書籍
-    success = database.update_book(
+    updated_book = database.update_book(
         book_id, book.title, book.author, book.publisher,
         book.price, book.publish_date, book.isbn, book.cover_url
     )
     # 檢查是否成功更新
-    if not success:
+    if updated_book is None:
         raise HTTPException(status_code=404, detail="Book not found")
-    # 取得更新後的書籍資料並回傳
-    updated_book = database.get_book_by_id(book_id)
-    return updated_book
+    # 清除列表與這本書的快取
+    cache_manager.invalidate_prefix("/books?")
+    cache_manager.invalidate(f"/books/{book_id}")
+    return updated_book # 回傳更新後的書籍資料
 
 @app.delete("/books/{book_id}", status_code=204) # 設定狀態碼為 204 No Content
 def delete_book(book_id: int):
@@ -78,4 +147,7 @@ def delete_book(book_id: int):
     success = database.delete_book(book_id)
     if not success:
         raise HTTPException(status_code=404, detail="Book not found")
+    # 清除列表與這本書的快取
+    cache_manager.invalidate_prefix("/books?")
+    cache_manager.invalidate(f"/books/{book_id}")
     return None
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 
 class BookCreate(BaseModel):
@@ -20,6 +20,9 @@ class BookResponse(BaseModel):
     """
     用於 API 回傳的模型，包含資料庫生成 id 與 created_at。
     """
+    # 允許直接從資料庫回傳的 Book (namedtuple) 以屬性方式讀取欄位
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     title: str
     author: str